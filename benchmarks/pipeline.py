@@ -0,0 +1,447 @@
+'''
+Benchmark suite for the audio codec and streaming pipelines.
+
+Runs the u-law codec, Recorder's processing step, Player's decoding and streaming
+loop and StorageManager's upload read path on synthetic audio of several durations.
+Deepgram, Supabase and the audio device are replaced by fakes, so the suite runs
+fully offline. For every benchmark it reports throughput in samples per second,
+peak memory and per-chunk latency, writes the results as JSON and compares them
+against a baseline.
+
+Usage:
+    python benchmarks/pipeline.py [--durations 1 10 60] [--output benchmarks/results.json]
+                                  [--baseline benchmarks/baseline.json] [--threshold 0.25]
+                                  [--save-baseline]
+'''
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 1024
+SEED = 0
+
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results.json')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+def synthetic_pcm(duration: float) -> np.ndarray:
+    '''
+    Returns reproducible 16 bit PCM audio: a tone with harmonics and some noise.
+    '''
+    rng = np.random.default_rng(SEED)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = 0.4 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 660 * t)
+    signal += 0.05 * rng.standard_normal(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+
+def synthetic_u_law(duration: float) -> np.ndarray:
+    '''
+    Returns reproducible u-law encoded audio, one byte per sample.
+    '''
+    rng = np.random.default_rng(SEED)
+    return rng.integers(0, 256, int(duration * SAMPLE_RATE), dtype=np.uint8)
+
+def synthetic_wav(duration: float) -> bytes:
+    '''
+    Returns a reproducible u-law WAV file as it is stored by Recorder.
+    '''
+    from scipy.io.wavfile import write
+    buffer = io.BytesIO()
+    write(buffer, SAMPLE_RATE, synthetic_u_law(duration))
+    return buffer.getvalue()
+
+# fakes
+
+class FakeDeepgramConnection:
+    def __init__(self) -> None:
+        self.sent_bytes = 0
+        self.sent_at = []
+
+    def on(self, event, handler) -> None:
+        pass
+
+    def start(self, options) -> bool:
+        return True
+
+    def send(self, data: bytes) -> None:
+        self.sent_bytes += len(data)
+        self.sent_at.append(time.perf_counter())
+
+    def finish(self) -> None:
+        pass
+
+class FakeDeepgramClient:
+    connection = None
+
+    def __init__(self, api_key: str = None) -> None:
+        connection = FakeDeepgramClient.connection = FakeDeepgramConnection()
+        self.listen = SimpleNamespace(live=SimpleNamespace(v=lambda version: connection))
+
+class FakeAudioStream:
+    def write(self, data: bytes) -> None:
+        pass
+
+    def stop_stream(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class FakePyAudio:
+    def open(self, **kwargs) -> FakeAudioStream:
+        return FakeAudioStream()
+
+    def terminate(self) -> None:
+        pass
+
+class FakeHTTPResponse:
+    def __init__(self, data: bytes, status: int = 200) -> None:
+        self.data = data
+        self.status = status
+        self.content = self
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.data if size < 0 else self.data[:size]
+
+    async def iter_chunked(self, size: int):
+        for i in range(0, len(self.data), size):
+            yield self.data[i:i + size]
+
+    async def __aenter__(self) -> 'FakeHTTPResponse':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+class FakeHTTPSession:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    def get(self, url: str, headers: dict = None, **kwargs) -> FakeHTTPResponse:
+        byte_range = (headers or {}).get('Range')
+        if not byte_range:
+            return FakeHTTPResponse(self.data)
+        first, last = byte_range[len('bytes='):].split('-')
+        end = int(last) + 1 if last else len(self.data)
+        return FakeHTTPResponse(self.data[int(first):end], 206)
+
+    async def __aenter__(self) -> 'FakeHTTPSession':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+class FakeQuery:
+    def __init__(self, data: list) -> None:
+        self.data = data
+
+    def insert(self, row: dict) -> 'FakeQuery':
+        return FakeQuery([{'id': 'recording', **row}])
+
+    def select(self, *args) -> 'FakeQuery':
+        return self
+
+    def eq(self, *args) -> 'FakeQuery':
+        return self
+
+    async def execute(self) -> 'FakeQuery':
+        return self
+
+class FakeBucket:
+    def __init__(self) -> None:
+        self.uploaded_bytes = 0
+
+    async def upload(self, file: bytes, path: str, file_options: dict = None) -> None:
+        self.uploaded_bytes += len(file)
+
+class FakeSupabase:
+    def __init__(self) -> None:
+        self.bucket = FakeBucket()
+        self.storage = SimpleNamespace(from_=lambda name: self.bucket)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery([])
+
+class FakeSession:
+    access_token = 'token'
+    refresh_token = None
+    expires_at = None
+    user = SimpleNamespace(id='user')
+
+# benchmarks, each returns the latencies in seconds of the chunks it processed,
+# or a single latency if it processes the whole recording at once
+
+def bench_u_law_e(duration: float, workdir: str) -> List[float]:
+    from src.utils.audio_processing import u_law_e
+    samples = [int(sample) for sample in synthetic_pcm(duration)]
+    latencies = []
+    for i in range(0, len(samples), CHUNK_SAMPLES):
+        start = time.perf_counter()
+        for sample in samples[i:i + CHUNK_SAMPLES]:
+            u_law_e(sample)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def bench_u_law_d(duration: float, workdir: str) -> List[float]:
+    from src.utils.audio_processing import u_law_d
+    samples = [int(sample) for sample in synthetic_u_law(duration)]
+    latencies = []
+    for i in range(0, len(samples), CHUNK_SAMPLES):
+        start = time.perf_counter()
+        for sample in samples[i:i + CHUNK_SAMPLES]:
+            u_law_d(sample)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def bench_u_law_encode(duration: float, workdir: str) -> List[float]:
+    from src.utils.audio_processing import u_law_encode
+    samples = synthetic_pcm(duration)
+    u_law_encode(samples[:1])  # build the lookup table outside of the measurement
+    latencies = []
+    for i in range(0, len(samples), CHUNK_SAMPLES):
+        start = time.perf_counter()
+        u_law_encode(samples[i:i + CHUNK_SAMPLES])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def bench_u_law_decode(duration: float, workdir: str) -> List[float]:
+    from src.utils.audio_processing import u_law_decode
+    samples = synthetic_u_law(duration)
+    u_law_decode(samples[:1])
+    latencies = []
+    for i in range(0, len(samples), CHUNK_SAMPLES):
+        start = time.perf_counter()
+        u_law_decode(samples[i:i + CHUNK_SAMPLES])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def bench_recorder_process(duration: float, workdir: str) -> List[float]:
+    import src.recording.recorder as recorder_module
+    from src.utils.audio_processing import u_law_encode
+    samples = synthetic_pcm(duration)
+    recording = samples.tobytes()
+    u_law_encode(samples[:1])  # build the lookup table outside of the measurement
+    recorder = recorder_module.Recorder()
+    with mock.patch.object(recorder_module, 'AUDIO_FILE_PATH', workdir), \
+            mock.patch.object(recorder_module, 'ensure_audio_file_path', lambda: workdir):
+        start = time.perf_counter()
+        asyncio.run(recorder._Recorder__process_and_save_recording(recording))
+        return [time.perf_counter() - start]
+
+def bench_player_decode(duration: float, workdir: str) -> List[float]:
+    import src.recording.player as player_module
+    data = synthetic_u_law(duration).tobytes()
+    player = player_module.Player.__new__(player_module.Player)
+
+    async def run() -> List[float]:
+        latencies = []
+        for i in range(0, len(data), CHUNK_SAMPLES):
+            start = time.perf_counter()
+            await player._Player__decode_stream(data[i:i + CHUNK_SAMPLES])
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    return asyncio.run(run())
+
+def bench_player_stream(duration: float, workdir: str) -> List[float]:
+    import src.recording.player as player_module
+    data = synthetic_wav(duration)
+    fake_aiohttp = SimpleNamespace(ClientSession=lambda: FakeHTTPSession(data))
+    fake_pyaudio = SimpleNamespace(PyAudio=FakePyAudio, paInt16=8)
+
+    with mock.patch.object(player_module, 'DeepgramClient', FakeDeepgramClient), \
+            mock.patch.object(player_module, 'aiohttp', fake_aiohttp), \
+            mock.patch.object(player_module, 'pyaudio', fake_pyaudio), \
+            mock.patch('builtins.print', side_effect=lambda *args, **kwargs: messages.append(' '.join(map(str, args)))):
+        # Player reports errors by printing them, so its output is kept to check the run
+        messages = []
+        FakeDeepgramClient.connection = None
+        player = player_module.Player('https://example.invalid/recording')
+        start = time.perf_counter()
+        asyncio.run(player.stream_and_transcribe_live())
+
+    # every u-law byte after the header is sent as a 16 bit sample
+    connection = FakeDeepgramClient.connection
+    expected_bytes = (len(data) - player_module.WAV_HEADER_SIZE) * 2
+    errors = [message for message in messages if message.startswith('Error')]
+    if errors or connection is None or connection.sent_bytes != expected_bytes:
+        sent_bytes = connection.sent_bytes if connection is not None else 0
+        raise RuntimeError(
+            f'player_stream sent {sent_bytes} of {expected_bytes} bytes to Deepgram: '
+            + ('; '.join(errors) or 'no error reported')
+        )
+
+    # a chunk's latency is the time from the previous send to its own send,
+    # the first one includes reading the header
+    sent_at = [start] + connection.sent_at
+    return [b - a for a, b in zip(sent_at, sent_at[1:])]
+
+def bench_upload_read(duration: float, workdir: str) -> List[float]:
+    import src.storage.storage_manager as storage_module
+    from scipy.io.wavfile import write
+    from src.auth import session
+
+    write(os.path.join(workdir, 'recording.wav'), SAMPLE_RATE, synthetic_u_law(duration))
+    supabase = FakeSupabase()
+
+    async def fake_client(access_token: str = None) -> FakeSupabase:
+        return supabase
+
+    session.authenticate(FakeSession())
+    try:
+        with mock.patch.object(storage_module, 'AUDIO_FILE_PATH', workdir), \
+                mock.patch.object(storage_module, 'AUDIO_FILE_NAME', 'recording.wav'), \
+                mock.patch.object(storage_module, 'supabase_client', fake_client):
+            manager = storage_module.StorageManager()
+            start = time.perf_counter()
+            asyncio.run(manager.upload_recording('benchmark'))
+            return [time.perf_counter() - start]
+    finally:
+        session.deauthenticate()
+
+BENCHMARKS: Dict[str, Callable[[float, str], List[float]]] = {
+    'u_law_e': bench_u_law_e,
+    'u_law_d': bench_u_law_d,
+    'u_law_encode': bench_u_law_encode,
+    'u_law_decode': bench_u_law_decode,
+    'recorder_process_and_save': bench_recorder_process,
+    'player_decode_stream': bench_player_decode,
+    'player_stream': bench_player_stream,
+    'upload_read': bench_upload_read,
+}
+
+def run_benchmark(name: str, duration: float, repeat: int) -> dict:
+    '''
+    Runs a benchmark, timing it over several repeats and measuring its peak memory in a separate run.
+    '''
+    bench = BENCHMARKS[name]
+    samples = int(duration * SAMPLE_RATE)
+
+    # only the measured chunks count, generating the synthetic audio is not timed
+    best, latencies = None, []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            run_latencies = bench(duration, workdir)
+        elapsed = sum(run_latencies)
+        if best is None or elapsed < best:
+            best, latencies = elapsed, run_latencies
+
+    # tracemalloc slows down allocations, so memory is measured in its own run
+    with tempfile.TemporaryDirectory() as workdir:
+        tracemalloc.start()
+        try:
+            bench(duration, workdir)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    latencies = sorted(latencies)
+    return {
+        'benchmark': name,
+        'duration_s': duration,
+        'samples': samples,
+        'seconds': best,
+        'samples_per_second': samples / best,
+        'peak_memory_bytes': peak,
+        'chunk_latency_ms': {
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+            'max': latencies[-1] * 1000,
+        },
+    }
+
+def find_regressions(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    '''
+    Compares results against a baseline and returns a description of each regression past the threshold.
+    '''
+    previous = {(r['benchmark'], r['duration_s']): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get((result['benchmark'], result['duration_s']))
+        if base is None:
+            continue
+        label = f"{result['benchmark']} ({result['duration_s']:g} s)"
+        if result['samples_per_second'] < base['samples_per_second'] * (1 - threshold):
+            regressions.append(
+                f"{label}: throughput {result['samples_per_second']:.0f} samples/s, "
+                f"baseline {base['samples_per_second']:.0f} samples/s"
+            )
+        if result['peak_memory_bytes'] > base['peak_memory_bytes'] * (1 + threshold):
+            regressions.append(
+                f"{label}: peak memory {result['peak_memory_bytes']} bytes, "
+                f"baseline {base['peak_memory_bytes']} bytes"
+            )
+        p95, base_p95 = result['chunk_latency_ms']['p95'], base['chunk_latency_ms']['p95']
+        if p95 > base_p95 * (1 + threshold):
+            regressions.append(f'{label}: p95 chunk latency {p95:.3f} ms, baseline {base_p95:.3f} ms')
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', type=float, nargs='+', default=[1, 10, 60],
+                        help='durations of the synthetic audio in seconds')
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS),
+                        help='benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the fastest is reported')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='file the results are written to')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('BENCHMARK_REGRESSION_THRESHOLD', 0.25)),
+                        help='allowed relative throughput drop, memory increase or p95 latency increase before failing')
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results to the baseline file')
+    args = parser.parse_args()
+
+    results = []
+    for name in args.benchmarks:
+        for duration in args.durations:
+            result = run_benchmark(name, duration, args.repeat)
+            results.append(result)
+            print(
+                f"{name:28} {duration:6g} s  {result['samples_per_second']:14,.0f} samples/s  "
+                f"{result['peak_memory_bytes'] / 2**20:8.2f} MiB  "
+                f"p95 chunk {result['chunk_latency_ms']['p95']:9.3f} ms"
+            )
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        return 0
+
+    baseline: Optional[Any] = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if baseline is None:
+        print('No baseline found, skipping the regression check.')
+        return 0
+
+    regressions = find_regressions(results, baseline['results'], args.threshold)
+    for regression in regressions:
+        print(f'REGRESSION: {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+'''
+Startup-time benchmark for the CLI.
+
+Measures how long `import main` takes and how long it takes until the welcome
+screen prompts for input, and fails if either exceeds its budget or if one of
+the heavy SDKs is imported before it is needed.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--import-budget 250] [--prompt-budget 400]
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROMPT = b'Select an option: '
+
+# modules that must not be loaded before the user picks an action
+HEAVY_MODULES = [
+    'deepgram',
+    'openai',
+    'supabase_py_async',
+    'pyaudio',
+    'numpy',
+    'scipy',
+    'pick',
+    'aiofiles',
+    'aiohttp',
+]
+
+def _python(*args: str, **kwargs) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, **kwargs)
+
+def measure_import() -> float:
+    '''
+    Returns the time in ms to import main, minus interpreter start-up.
+    '''
+    def run(code: str) -> float:
+        start = time.perf_counter()
+        proc = _python('-c', code)
+        if proc.wait() != 0:
+            raise RuntimeError(f'Failed to run: {code}')
+        return (time.perf_counter() - start) * 1000
+
+    return run('import main') - run('pass')
+
+def measure_first_prompt() -> float:
+    '''
+    Returns the time in ms from launching main.py until the welcome prompt is shown.
+    '''
+    start = time.perf_counter()
+    proc = _python('-u', 'main.py', stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output = b''
+    try:
+        while not output.endswith(PROMPT):
+            chunk = proc.stdout.read1(1024)
+            if not chunk:
+                raise RuntimeError(f'main.py exited before prompting: {output!r}')
+            output += chunk
+        elapsed = (time.perf_counter() - start) * 1000
+        # choose "Exit" on the welcome screen
+        proc.communicate(b'2\n', timeout=10)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    return elapsed
+
+def loaded_heavy_modules() -> list:
+    '''
+    Returns the heavy modules that are imported as a side effect of `import main`.
+    '''
+    code = f'import sys, json, main; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+    return json.loads(output)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='number of runs, the median is reported')
+    parser.add_argument('--import-budget', type=float, default=float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', 250)),
+                        help='maximum median import time in ms')
+    parser.add_argument('--prompt-budget', type=float, default=float(os.environ.get('STARTUP_PROMPT_BUDGET_MS', 400)),
+                        help='maximum median time to first prompt in ms')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    import_ms = statistics.median(measure_import() for _ in range(args.runs))
+    prompt_ms = statistics.median(measure_first_prompt() for _ in range(args.runs))
+    heavy = loaded_heavy_modules()
+
+    results = {
+        'import_ms': round(import_ms, 2),
+        'first_prompt_ms': round(prompt_ms, 2),
+        'import_budget_ms': args.import_budget,
+        'first_prompt_budget_ms': args.prompt_budget,
+        'eager_heavy_modules': heavy,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if import_ms > args.import_budget:
+        failures.append(f'import took {import_ms:.1f} ms, budget is {args.import_budget:.1f} ms')
+    if prompt_ms > args.prompt_budget:
+        failures.append(f'first prompt took {prompt_ms:.1f} ms, budget is {args.prompt_budget:.1f} ms')
+    if heavy:
+        failures.append(f'heavy modules imported at startup: {", ".join(heavy)}')
+
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
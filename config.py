@@ -8,11 +8,30 @@ SUPABASE_KEY: str = os.environ.get('SUPABASE_KEY')
 DEEPGRAM_API_KEY: str = os.environ.get('DEEPGRAM_KEY')
 OPENAI_API_KEY: str = os.environ.get('OPENAI_KEY')
 
+# latency metrics are written here after each recording or playback (.json, or .prom for Prometheus text)
+METRICS_EXPORT_PATH: str = os.environ.get('METRICS_EXPORT_PATH')
+
+# tracing is enabled when set, a Chrome trace-event JSON file is written here at exit
+TRACE_EXPORT_PATH: str = os.environ.get('TRACE_EXPORT_PATH')
+
 AUDIO_FILE_PATH: str = os.path.join(os.getcwd(), 'audio_files')
 AUDIO_FILE_NAME: str = 'recording.wav'
 
-if not os.path.exists(AUDIO_FILE_PATH):
-  os.makedirs(AUDIO_FILE_PATH)
+INDEX_FILE_PATH: str = os.path.join(os.getcwd(), 'transcript_index.db')
+
+# number of channels captured from the input device, e.g. one per microphone of a meeting room setup
+RECORDING_CHANNELS: int = int(os.environ.get('RECORDING_CHANNELS', 1))
+RECORDING_INPUT_DEVICE: int = int(os.environ['RECORDING_INPUT_DEVICE']) if os.environ.get('RECORDING_INPUT_DEVICE') else None
+
+CACHE_DIR_PATH: str = os.path.join(os.getcwd(), 'recording_cache')
+CACHE_MAX_BYTES: int = int(os.environ.get('RECORDING_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+def ensure_audio_file_path() -> str:
+  '''
+  Creates the audio file directory on first use instead of at import time.
+  '''
+  os.makedirs(AUDIO_FILE_PATH, exist_ok=True)
+  return AUDIO_FILE_PATH
 
 SUMMARIZE_PROMPT: str = 'You will be given a transcript of an audio recording. Summarize the text in 100 words or less.'
 
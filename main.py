@@ -1,14 +1,10 @@
 import asyncio
 import getpass
 import logging
-from pick import pick
-from supabase_py_async import StorageException
 
 from src.auth import AuthManager
 from src.storage import StorageManager
-from src.recording import Recorder
-from src.recording import Player
-from src.recording import Summarizer
+from src.utils.tracing import traced
 
 logging.getLogger('httpx').setLevel(logging.WARNING)
 
@@ -31,6 +27,7 @@ class SpeechTranscriptionApp:
         _main_menu: Displays the main menu and handles user actions.
         _new_recording: Records and transcribes speech, and lets the user upload the recording.
         _list_recordings: Lists the user's recordings and lets the user play a selected recording.
+        _search_recordings: Searches the transcripts of the user's recordings and plays a selected match.
         _logout: Logs out the user and returns to the welcome screen.
     '''
 
@@ -92,17 +89,23 @@ class SpeechTranscriptionApp:
         choices = {
             '0': self._new_recording,
             '1': self._list_recordings,
-            '2': self._logout
+            '2': self._search_recordings,
+            '3': self._logout
         }
 
         while True:
-            print('\n0: Record\n1: List Recordings\n2: Logout\n')
+            print('\n0: Record\n1: List Recordings\n2: Search Recordings\n3: Logout\n')
             choice = input('Select an option: ')
             action = choices.get(choice)
             if action:
                 await action()
 
+    @traced('new_recording')
     async def _new_recording(self) -> None:
+        # heavy SDKs are imported on first use to keep startup fast
+        from supabase_py_async import StorageException
+        from src.recording import Recorder, Summarizer
+
         recorder = Recorder()
         transcription = await recorder.record_and_transcribe_live()
 
@@ -124,7 +127,7 @@ class SpeechTranscriptionApp:
         if choice == '0':
             name = input('Give your recording a name: ')
             try:
-                await self.storage.upload_recording(name)
+                await self.storage.upload_recording(name, recorder.segments)
                 print('Recording uploaded successfully!\n')
             except StorageException as e:
                 print(f'Failed to upload recording: {e}\n')
@@ -139,22 +142,57 @@ class SpeechTranscriptionApp:
         except Exception as e:
             print(f'An unexpected error occurred while discarding: {e}\n')
 
+    @traced('list_recordings')
     async def _list_recordings(self) -> None:
+        from pick import pick
+        from supabase_py_async import StorageException
+        from src.recording import Player
+
         try:
             recordings = await self.storage.list_recordings()
             if not recordings:
                 print('No recordings found.\n')
                 return            
             _, index = pick([r[1] for r in recordings], 'Select a recording to listen:')
-            recording_id = recordings[index][0]
-            url = await self.storage.get_stream_url(recording_id)
-            player = Player(url)
+            recording_id, _, version = recordings[index]
+            # cached recordings are replayed without fetching a new signed URL
+            url = None
+            if not self.storage.cache.get(recording_id, version):
+                url = await self.storage.get_stream_url(recording_id)
+            player = Player(url, recording_id=recording_id, version=version, cache=self.storage.cache)
             await player.stream_and_transcribe_live()
         except StorageException as e:
             print(f'Failed to list or play recordings: {e}\n')
         except Exception as e:
             print(f'An unexpected error occurred while listing recordings: {e}\n')
 
+    @traced('search_recordings')
+    async def _search_recordings(self) -> None:
+        from pick import pick
+        from supabase_py_async import StorageException
+        from src.recording import Player
+
+        query = input('Search transcripts: ')
+        try:
+            matches = await self.storage.search_recordings(query)
+            if not matches:
+                print('No matching recordings found.\n')
+                return
+            options = [f'{name} [{int(start // 60)}:{int(start % 60):02d}] {text}' for _, name, start, text in matches]
+            _, index = pick(options, 'Select a match to listen:')
+            recording_id, _, start, _ = matches[index]
+            # the index doesn't track versions, so look it up to avoid replaying a stale cached copy
+            version = await self.storage.get_recording_version(recording_id)
+            url = None
+            if not self.storage.cache.get(recording_id, version):
+                url = await self.storage.get_stream_url(recording_id)
+            player = Player(url, start=start, recording_id=recording_id, version=version, cache=self.storage.cache)
+            await player.stream_and_transcribe_live()
+        except StorageException as e:
+            print(f'Failed to search or play recordings: {e}\n')
+        except Exception as e:
+            print(f'An unexpected error occurred while searching recordings: {e}\n')
+
     async def _logout(self) -> None:
         try:
             await self.auth_manager.logout()
@@ -56,6 +56,6 @@ class AuthManager:
         from .session_cache import session
         if not session.is_authenticated():
             raise Exception('User is not authenticated. Please log in first.')
-        supabase = await supabase_client(access_token=session.get_token())
+        supabase = await supabase_client(access_token=await session.get_valid_token())
         await supabase.auth.sign_out()
         session.deauthenticate()
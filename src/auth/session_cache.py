@@ -1,29 +1,197 @@
-from typing import Any
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
 
-class SessionCache:
+DEFAULT_KEY = 'default'
+
+# refresh the access token this many seconds before it expires,
+# or halfway through its lifetime for tokens shorter than twice the margin
+REFRESH_MARGIN = 60
+
+# minimum seconds between refreshes of the same session, so that short-lived
+# tokens or a skewed clock can't make refreshes follow each other immediately
+MIN_REFRESH_INTERVAL = 5
+
+logger = logging.getLogger(__name__)
+
+async def _refresh_with_supabase(refresh_token: str) -> Any:
     '''
-    This class represents a session cache for storing authentication information.
+    Exchanges a refresh token for a new Supabase session.
+
+    Args:
+        refresh_token (str): The refresh token of the current session.
+
+    Returns:
+        Session: The refreshed session.
     '''
+    from src.storage import supabase_client
+    supabase = await supabase_client()
+    response = await supabase.auth.refresh_session(refresh_token)
+    return response.session
 
-    def __init__(self) -> None:
-        self.token = None
-        self.user = None
+class _SessionEntry:
+    '''
+    Authentication information of a single cached user.
+    '''
 
-    def authenticate(self, session) -> None:
+    def __init__(self, session) -> None:
+        self.timer: Optional[asyncio.Task] = None
+        self.refreshing: Optional[asyncio.Task] = None
+        self.update(session)
+
+    def update(self, session) -> None:
         self.token = session.access_token
+        self.refresh_token = getattr(session, 'refresh_token', None)
+        self.expires_at = getattr(session, 'expires_at', None)
         self.user = session.user
+        # the lifetime is tracked on the monotonic clock, expires_in is relative
+        # so it isn't affected by the local clock being out of sync with the server
+        self.updated_at = time.monotonic()
+        self.lifetime = getattr(session, 'expires_in', None)
+        if self.lifetime is None and self.expires_at is not None:
+            self.lifetime = self.expires_at - time.time()
+        if self.lifetime is not None:
+            self.lifetime = max(0.0, self.lifetime)
+
+    def refresh_in(self, margin: float) -> Optional[float]:
+        '''
+        Returns the seconds until the token should be refreshed, or None if it doesn't expire.
+        '''
+        if self.lifetime is None:
+            return None
+        margin = min(margin, self.lifetime / 2)
+        return self.lifetime - margin - (time.monotonic() - self.updated_at)
+
+    def refreshed_recently(self) -> bool:
+        return time.monotonic() - self.updated_at < MIN_REFRESH_INTERVAL
+
+class SessionCache:
+    '''
+    This class represents a session cache for storing authentication information.
+
+    Sessions are keyed so that several users can be cached at once. Each session's
+    access token is refreshed in the background shortly before it expires, and
+    concurrent callers that need a fresh token share a single refresh request.
+
+    Args:
+        refresher (Callable, optional): Coroutine function exchanging a refresh token
+            for a new session. Defaults to refreshing through Supabase.
+        refresh_margin (float, optional): Seconds before expiry at which the token is refreshed.
+    '''
+
+    def __init__(
+        self,
+        refresher: Callable[[str], Awaitable[Any]] = _refresh_with_supabase,
+        refresh_margin: float = REFRESH_MARGIN
+    ) -> None:
+        self.refresher = refresher
+        self.refresh_margin = refresh_margin
+        self.entries: Dict[str, _SessionEntry] = {}
+
+    def authenticate(self, session, key: str = DEFAULT_KEY) -> None:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = _SessionEntry(session)
+        else:
+            entry.update(session)
+        self.__schedule_refresh(key, entry)
+
+    def deauthenticate(self, key: str = DEFAULT_KEY) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for task in (entry.timer, entry.refreshing):
+            if task is not None and not task.done():
+                task.cancel()
+
+    def is_authenticated(self, key: str = DEFAULT_KEY) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry.token is not None and entry.user is not None
+
+    def get_user(self, key: str = DEFAULT_KEY) -> Any:
+        entry = self.entries.get(key)
+        return entry.user if entry else None
+
+    def get_token(self, key: str = DEFAULT_KEY) -> str:
+        entry = self.entries.get(key)
+        return entry.token if entry else None
+
+    async def get_valid_token(self, key: str = DEFAULT_KEY) -> str:
+        '''
+        Returns an access token that will not expire within the refresh margin,
+        refreshing the session first if necessary.
+
+        Args:
+            key (str, optional): The key of the cached user.
+
+        Returns:
+            str: The access token.
+
+        Raises:
+            Exception: If the user is not authenticated.
+        '''
+        entry = self.entries.get(key)
+        if entry is None:
+            raise Exception('User is not authenticated. Please log in first.')
+        refresh_in = entry.refresh_in(self.refresh_margin)
+        if entry.refresh_token and refresh_in is not None and refresh_in <= 0 and not entry.refreshed_recently():
+            await self.refresh(key)
+        return entry.token
+
+    async def refresh(self, key: str = DEFAULT_KEY) -> None:
+        '''
+        Refreshes the session of the given user. Concurrent calls for the same
+        user wait on the same in-flight refresh.
+
+        Args:
+            key (str, optional): The key of the cached user.
 
-    def deauthenticate(self) -> None:
-        self.token = None
-        self.user = None
+        Raises:
+            Exception: If the user is not authenticated.
+        '''
+        entry = self.entries.get(key)
+        if entry is None:
+            raise Exception('User is not authenticated. Please log in first.')
+        if entry.refreshing is None or entry.refreshing.done():
+            entry.refreshing = asyncio.ensure_future(self.__refresh(key, entry))
+        # shield so that a cancelled caller doesn't cancel the shared refresh
+        await asyncio.shield(entry.refreshing)
 
-    def is_authenticated(self) -> bool:
-        return self.token is not None and self.user is not None
+    async def __refresh(self, key: str, entry: _SessionEntry) -> None:
+        session = await self.refresher(entry.refresh_token)
+        if session is None:
+            raise Exception('Failed to refresh the session.')
+        # the user may have logged out while the refresh was in flight
+        if self.entries.get(key) is not entry:
+            return
+        entry.update(session)
+        self.__schedule_refresh(key, entry)
 
-    def get_user(self) -> Any:
-        return self.user
+    def __schedule_refresh(self, key: str, entry: _SessionEntry) -> None:
+        if entry.timer is not None and not entry.timer.done():
+            entry.timer.cancel()
+        entry.timer = None
+        refresh_in = entry.refresh_in(self.refresh_margin)
+        if refresh_in is None or not entry.refresh_token:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop, the token is refreshed on demand instead
+            return
+        delay = max(MIN_REFRESH_INTERVAL, refresh_in)
+        entry.timer = loop.create_task(self.__refresh_later(key, entry, delay))
 
-    def get_token(self) -> str:
-        return self.token
+    async def __refresh_later(self, key: str, entry: _SessionEntry, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # detach before refreshing, rescheduling must not cancel this task
+        entry.timer = None
+        try:
+            await self.refresh(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f'Background token refresh failed: {e}')
 
 session = SessionCache()
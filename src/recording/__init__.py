@@ -1,5 +1,24 @@
-from .player import Player
-from .recorder import Recorder
-from .summarizer import Summarizer
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .player import Player
+    from .recorder import Recorder
+    from .summarizer import Summarizer
 
 __all__ = ['Player', 'Recorder', 'Summarizer']
+
+# submodules pull in pyaudio, deepgram and openai, so they are only
+# imported when one of the classes is first accessed
+_submodules = {
+    'Player': '.player',
+    'Recorder': '.recorder',
+    'Summarizer': '.summarizer',
+}
+
+def __getattr__(name: str):
+    if name in _submodules:
+        value = getattr(importlib.import_module(_submodules[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,4 +1,5 @@
-from typing import Any, Tuple
+import mmap
+from typing import Any, Optional, Tuple
 import aiohttp
 import pyaudio
 import numpy as np
@@ -9,30 +10,107 @@ from deepgram import (
     LiveTranscriptionEvents
 )
 
-from config import DEEPGRAM_API_KEY
-from src.utils.audio_processing import u_law_d
+from config import DEEPGRAM_API_KEY, METRICS_EXPORT_PATH
+from src.utils.audio_processing import u_law_decode, wav_channels
+from src.utils.keyboard import KeyListener
+from src.utils.metrics import StreamInstrumentation, metrics
+from src.utils.tracing import span, traced
+
+SAMPLE_RATE = 16000
+WAV_HEADER_SIZE = 44
+CHUNK_SIZE = 1024
+
+# seconds skipped by the forward and back keys
+SKIP_SECONDS = 10
 
 class Player():
     '''
     Represents a player for streaming and transcribing live audio.
 
+    Only the requested window of the recording is fetched, using HTTP Range requests.
+    u-law audio is one byte per sample, so offsets map directly to bytes after the WAV header.
+    If a recording cache is given, cached recordings are played from disk without any
+    network traffic, and a recording streamed in full is written to the cache.
+    Multichannel recordings are transcribed per channel over a single Deepgram
+    connection and played back mixed down to mono.
+
     Args:
-        url (str): The URL of the audio stream.
+        url (str): The URL of the audio stream. Not needed if the recording is cached.
+        start (float, optional): The offset in seconds to start playing from. Defaults to 0.
+        end (float, optional): The offset in seconds to stop playing at. Defaults to the end of the recording.
+        recording_id (str, optional): The ID of the recording, used as the cache key.
+        version (str, optional): The content version of the recording.
+        cache (RecordingCache, optional): The cache of downloaded recordings.
 
     Attributes:
         url (str): The URL of the audio stream.
+        start (float): The offset in seconds to start playing from.
+        end (float): The offset in seconds to stop playing at, or None for the end of the recording.
+        position (float): The offset in seconds of the audio played last.
+        channels (int): The number of channels of the recording, read from its WAV header.
+        recording_id (str): The ID of the recording.
+        version (str): The content version of the recording.
+        cache (RecordingCache): The cache of downloaded recordings.
         p (pyaudio.PyAudio): The PyAudio instance.
         stream (pyaudio.Stream): The audio stream.
+        instrumentation (StreamInstrumentation): Latency instrumentation of the playback.
     '''
 
-    def __init__(self, url: str) -> None:
+    def __init__(
+        self,
+        url: Optional[str],
+        start: float = 0,
+        end: Optional[float] = None,
+        recording_id: Optional[str] = None,
+        version: Optional[str] = None,
+        cache: Any = None
+    ) -> None:
         self.url = url
+        self.start = start
+        self.end = end
+        self.position = start
+        self.recording_id = recording_id
+        self.version = version
+        self.cache = cache
+        self.channels = 1
         self.p = pyaudio.PyAudio()
         self.stream = None
-        
+        self.instrumentation = StreamInstrumentation('player')
+        self.__seek_requested = False
+        self.__stopped = False
+
+    def seek(self, start: float, end: Optional[float] = None) -> None:
+        '''
+        Sets the window of the recording to play. During playback, streaming
+        continues from the new start offset.
+
+        Args:
+            start (float): The offset in seconds to start playing from.
+            end (float, optional): The offset in seconds to stop playing at. Defaults to the end of the recording.
+        '''
+        self.start = max(0.0, start)
+        self.end = end
+        self.position = self.start
+        self.__seek_requested = True
+
+    def stop(self) -> None:
+        '''
+        Stops the playback after the current chunk.
+        '''
+        self.__stopped = True
+
+    def __on_key(self, command: str) -> None:
+        if command == 'forward':
+            self.seek(self.position + SKIP_SECONDS, self.end)
+        elif command == 'back':
+            self.seek(self.position - SKIP_SECONDS, self.end)
+        elif command == 'quit':
+            self.stop()
+
+    @traced('stream_and_transcribe_live', category='playback')
     async def stream_and_transcribe_live(self) -> None:
         '''
-        Streams and transcribes live audio from the specified URL.
+        Streams and transcribes live audio from the specified URL, or from the cache if the recording is cached.
 
         Raises:
             RuntimeError: If the player is already running.
@@ -40,23 +118,29 @@ class Player():
         if self.stream is not None:
             raise RuntimeError('Player is already running')
         self.stream = self.p.open(format=pyaudio.paInt16, channels=1, rate=16000, output=True)
-    
+        self.__stopped = False
+        keys = KeyListener(self.__on_key)
+
         try:
+            cached_path = None
+            if self.cache is not None and self.recording_id is not None:
+                cached_path = self.cache.get(self.recording_id, self.version)
+
+            self.channels = wav_channels(await self.__read_header(cached_path))
+            self.instrumentation = StreamInstrumentation('player', channels=self.channels)
+
             dg_connection, options = await self.__configure_deepgram()
 
             if not dg_connection.start(options):
                 raise Exception('Failed to connect to Deepgram')
-   
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.url) as response:
-                    async for data in response.content.iter_chunked(1024):
-                        decoded_bytes = await self.__decode_stream(data)
 
-                        # Send data to Deepgram
-                        dg_connection.send(decoded_bytes)
+            if keys.start():
+                print(f'Press f or → to skip {SKIP_SECONDS}s forward, b or ← to skip back, q to stop.')
 
-                        # Play audio
-                        self.stream.write(decoded_bytes)
+            if cached_path:
+                await self.__play_cached(cached_path, dg_connection)
+            else:
+                await self.__stream(dg_connection)
 
             # Indicate that we've finished
             dg_connection.finish()
@@ -66,8 +150,171 @@ class Player():
             print(f'Error: {e}')
             await self.__cleanup()
         finally:
+            keys.stop()
             await self.__cleanup()
 
+    async def __read_header(self, cached_path: Optional[str]) -> bytes:
+        '''
+        Reads the WAV header of the recording, from the cache or with a Range request.
+
+        Args:
+            cached_path (str): The path of the cached recording, or None if it isn't cached.
+        '''
+        if cached_path:
+            with open(cached_path, 'rb') as f:
+                return f.read(WAV_HEADER_SIZE)
+
+        async with aiohttp.ClientSession() as session:
+            headers = {'Range': f'bytes=0-{WAV_HEADER_SIZE - 1}'}
+            async with session.get(self.url, headers=headers) as response:
+                if response.status not in (200, 206):
+                    raise Exception(f'Failed to read recording header: HTTP {response.status}')
+                return await response.content.read(WAV_HEADER_SIZE)
+
+    def __window(self) -> Tuple[int, Optional[int]]:
+        '''
+        Returns the first and last byte of the current window, the last one is None for the end of the recording.
+        '''
+        first = WAV_HEADER_SIZE + int(self.start * SAMPLE_RATE) * self.channels
+        last = WAV_HEADER_SIZE + int(self.end * SAMPLE_RATE) * self.channels - 1 if self.end is not None else None
+        return first, last
+
+    async def __stream(self, dg_connection: Any) -> None:
+        '''
+        Streams the recording from its URL, starting over at the new window after each seek.
+        A recording streamed in full is written through to the cache.
+
+        Args:
+            dg_connection: The Deepgram connection.
+        '''
+        writer = None
+        if self.cache is not None and self.recording_id is not None and self.start == 0 and self.end is None:
+            writer = self.cache.writer(self.recording_id, self.version)
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                while not self.__stopped:
+                    self.__seek_requested = False
+                    complete = await self.__stream_window(session, dg_connection, writer)
+                    # only the first window is written through, and only if it was played to the end
+                    if writer is not None:
+                        if complete:
+                            writer.commit()
+                        else:
+                            writer.abort()
+                        writer = None
+                    if not self.__seek_requested:
+                        break
+        finally:
+            if writer is not None:
+                writer.abort()
+
+    async def __stream_window(self, session: aiohttp.ClientSession, dg_connection: Any, writer: Any = None) -> bool:
+        '''
+        Streams the current window of the recording, until its end or until a seek or stop is requested.
+
+        Args:
+            session (aiohttp.ClientSession): The HTTP session.
+            dg_connection: The Deepgram connection.
+            writer (CacheWriter, optional): Writer the whole file, including its header, is written to.
+
+        Returns:
+            bool: Whether the window was streamed to its end.
+
+        Raises:
+            Exception: If the server responds with an error status, the written recording is then discarded.
+        '''
+        first, last = self.__window()
+        if last is not None and last < first:
+            return True
+
+        # the cache needs the file from its first byte
+        fetch_from = 0 if writer is not None else first
+        headers = {'Range': f'bytes={fetch_from}-{last if last is not None else ""}'}
+        async with session.get(self.url, headers=headers) as response:
+            # the window starts past the end of the recording, there is nothing to write through
+            if response.status == 416:
+                return writer is None
+            if response.status not in (200, 206):
+                raise Exception(f'Failed to stream recording: HTTP {response.status}')
+            # servers that ignore Range send the whole file, skip up to the window
+            skip = first - fetch_from if response.status == 206 else first
+            remaining = last - first + 1 if last is not None else None
+            self.position = self.start
+            # bytes of an incomplete frame, played with the next chunk
+            pending = b''
+
+            async for data in response.content.iter_chunked(CHUNK_SIZE):
+                if self.__stopped or self.__seek_requested:
+                    return False
+                if writer is not None:
+                    writer.write(data)
+                if skip >= len(data):
+                    skip -= len(data)
+                    continue
+                data, skip = data[skip:], 0
+                if remaining is not None:
+                    data = data[:remaining]
+                    remaining -= len(data)
+                if self.channels > 1:
+                    data = pending + data
+                    frames_end = len(data) - len(data) % self.channels
+                    data, pending = data[:frames_end], data[frames_end:]
+
+                if data:
+                    await self.__play_chunk(data, dg_connection)
+
+                if remaining == 0:
+                    break
+        return True
+
+    async def __play_cached(self, path: str, dg_connection: Any) -> None:
+        '''
+        Plays a cached recording from its memory-mapped file, starting over at the new window after each seek.
+
+        Args:
+            path (str): The path of the cached recording.
+            dg_connection: The Deepgram connection.
+        '''
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as recording:
+            while not self.__stopped:
+                self.__seek_requested = False
+                first, last = self.__window()
+                end = len(recording) if last is None else min(last + 1, len(recording))
+                self.position = self.start
+                # whole frames only
+                chunk_size = CHUNK_SIZE - CHUNK_SIZE % self.channels
+
+                for offset in range(first, end, chunk_size):
+                    if self.__stopped or self.__seek_requested:
+                        break
+                    await self.__play_chunk(recording[offset:min(offset + chunk_size, end)], dg_connection)
+
+                if not self.__seek_requested:
+                    break
+
+    async def __play_chunk(self, data: bytes, dg_connection: Any) -> None:
+        '''
+        Decodes a chunk of u-law audio, sends it to Deepgram and plays it.
+
+        Args:
+            data (bytes): The u-law encoded chunk of whole frames.
+            dg_connection: The Deepgram connection.
+        '''
+        received_at = self.instrumentation.now()
+        with span('decode', category='encode'):
+            decoded_bytes = await self.__decode_stream(data)
+
+        # Send data to Deepgram
+        with span('send', category='network'):
+            dg_connection.send(decoded_bytes)
+        self.instrumentation.chunk_sent(len(decoded_bytes), received_at)
+
+        # Play audio
+        with span('play', category='audio'):
+            self.stream.write(self.__downmix(decoded_bytes) if self.channels > 1 else decoded_bytes)
+        self.position += len(data) / (SAMPLE_RATE * self.channels)
+
     async def __configure_deepgram(self) -> Tuple[Any, LiveOptions]:
         '''
         Configures the Deepgram client and sets up the event callbacks.
@@ -78,13 +325,19 @@ class Player():
         try:
             deepgram = DeepgramClient(DEEPGRAM_API_KEY)
             dg_connection = deepgram.listen.live.v('1')
+            instrumentation = self.instrumentation
+            multichannel = self.channels > 1
 
             # callback functions
             def on_message(self, result, **kwargs):
-                sentence = result.channel.alternatives[0].transcript
-                if len(sentence) == 0:
-                    return
-                print(f'speaker: {sentence}')
+                with span('transcript_callback', category='callback'), instrumentation.time_callback():
+                    instrumentation.transcript_received(result.start, result.duration)
+                    sentence = result.channel.alternatives[0].transcript
+                    if len(sentence) == 0:
+                        return
+                    # with multichannel, channel_index is [channel, number of channels]
+                    speaker = f'speaker {result.channel_index[0]}' if multichannel else 'speaker'
+                    print(f'{speaker}: {sentence}')
 
             def on_error(self, error, **kwargs):
                 print(f'\n\n{error}\n\n')
@@ -101,7 +354,8 @@ class Player():
                 punctuate=True,
                 language='en-US',
                 encoding='linear16',
-                channels=1,
+                channels=self.channels,
+                multichannel=self.channels > 1,
                 sample_rate=16000,
                 #interim_results=True,
                 #utterance_end_ms='1000',
@@ -125,8 +379,21 @@ class Player():
             bytes: The decoded audio stream.
         '''
         data_uint8 = np.frombuffer(stream, dtype=np.uint8)
-        decoded = np.array([u_law_d(sample) for sample in data_uint8], dtype=np.int16)
+        decoded = u_law_decode(data_uint8)
         return decoded.tobytes()
+
+    def __downmix(self, decoded: bytes) -> bytes:
+        '''
+        Mixes interleaved 16 bit PCM channels down to mono for playback.
+
+        Args:
+            decoded (bytes): The decoded audio, with interleaved channels.
+
+        Returns:
+            bytes: The mono audio.
+        '''
+        frames = np.frombuffer(decoded, dtype=np.int16).reshape(-1, self.channels)
+        return frames.mean(axis=1).astype(np.int16).tobytes()
     
     async def __cleanup(self) -> None:
         '''
@@ -137,4 +404,6 @@ class Player():
             self.stream.close()
             self.stream = None
         self.p.terminate()
+        if METRICS_EXPORT_PATH:
+            metrics.export(METRICS_EXPORT_PATH)
         return
@@ -1,6 +1,6 @@
 import asyncio
 import os
-from typing import Any, Tuple
+from typing import Any, Optional, Tuple
 from scipy.io.wavfile import write
 import numpy as np
 from deepgram import (
@@ -10,26 +10,59 @@ from deepgram import (
     Microphone
 )
 
-from config import DEEPGRAM_API_KEY, AUDIO_FILE_PATH, AUDIO_FILE_NAME
-from src.utils.audio_processing import u_law_e
+from config import (
+    DEEPGRAM_API_KEY,
+    AUDIO_FILE_PATH,
+    AUDIO_FILE_NAME,
+    METRICS_EXPORT_PATH,
+    RECORDING_CHANNELS,
+    RECORDING_INPUT_DEVICE,
+    ensure_audio_file_path
+)
+from src.utils.audio_processing import u_law_encode
+from src.utils.metrics import StreamInstrumentation, metrics
+from src.utils.tracing import span, traced
 
 class Recorder():
     '''
     The Recorder class is responsible for recording audio and performing real-time speech transcription.
 
+    With more than one channel, e.g. one per microphone of a multichannel input device,
+    all channels are sent interleaved over a single Deepgram connection and transcribed
+    per channel, and the recording is saved as one multichannel file.
+
+    Args:
+        channels (int, optional): The number of channels to capture. Defaults to RECORDING_CHANNELS.
+        input_device_index (int, optional): The index of the input device. Defaults to RECORDING_INPUT_DEVICE,
+            or the default input device if that isn't set.
+
     Attributes:
-        recording (bytearray): The recorded audio data.
+        channels (int): The number of captured channels.
+        input_device_index (int): The index of the input device, or None for the default one.
+        recording (bytearray): The recorded audio data, with interleaved channels.
         transcription (str): Transcription of the recording.
+        segments (list): Timestamped transcript segments of the last recording,
+            as tuples of start and end offset in seconds and text.
+        instrumentation (StreamInstrumentation): Latency instrumentation of the current recording.
 
     Methods:
         record_and_transcribe_live: Starts recording audio and performs real-time speech transcription.
         delete_recording: Deletes the recorded audio file.
     '''
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        channels: int = RECORDING_CHANNELS,
+        input_device_index: Optional[int] = RECORDING_INPUT_DEVICE
+    ) -> None:
+        self.channels = channels
+        self.input_device_index = input_device_index
         self.recording = None
         self.transcription = ''
+        self.segments = []
+        self.instrumentation = None
 
+    @traced('record_and_transcribe_live', category='recording')
     async def record_and_transcribe_live(self) -> str:
         '''
         Starts recording audio and performs real-time speech transcription.
@@ -43,6 +76,8 @@ class Recorder():
         if self.recording is not None:
             raise RuntimeError('Recorder is already running')
         self.recording = bytearray()
+        self.segments = []
+        self.instrumentation = StreamInstrumentation('recorder', channels=self.channels)
 
         try:
             dg_connection, options = await self.__configure_deepgram()
@@ -51,11 +86,19 @@ class Recorder():
                 print('Failed to connect to Deepgram')
                 return
 
+            instrumentation = self.instrumentation
+
             def microphone_callback(data):
+                captured_at = instrumentation.now()
                 self.recording.extend(data)
                 dg_connection.send(data)
+                instrumentation.chunk_sent(len(data), captured_at)
 
-            microphone = Microphone(microphone_callback)
+            microphone = Microphone(
+                microphone_callback,
+                channels=self.channels,
+                input_device_index=self.input_device_index
+            )
 
             print('Recording... Press Enter to stop recording.')
 
@@ -68,7 +111,8 @@ class Recorder():
             print('Recording complete.\n')
 
             print('Processing recording...')
-            await self.__process_and_save_recording(self.recording)
+            with span('process_and_save_recording', category='encode', bytes=len(self.recording)):
+                await self.__process_and_save_recording(self.recording)
             print('Recording processed.\n')
 
             return self.transcription
@@ -83,8 +127,11 @@ class Recorder():
         '''
         Cleans up the recorder by resetting the recording and transcription attributes.
         '''
+        if METRICS_EXPORT_PATH:
+            metrics.export(METRICS_EXPORT_PATH)
         self.recording = None
         self.transcription = ''
+        self.instrumentation = None
 
     async def __configure_deepgram(self) -> Tuple[Any, LiveOptions]:
         '''
@@ -96,17 +143,27 @@ class Recorder():
         try:
             deepgram = DeepgramClient(DEEPGRAM_API_KEY)
             dg_connection = deepgram.listen.live.v('1')
+            instrumentation = self.instrumentation
+            multichannel = self.channels > 1
 
             # callback functions
             def on_message(self, result, **kwargs):
-                sentence = result.channel.alternatives[0].transcript
-                if len(sentence) == 0:
-                    return
-                print(f'speaker: {sentence}')
-                extend_transcription(sentence)
-
-            def extend_transcription(sentence):
-                self.transcription += f'{sentence} '
+                with span('transcript_callback', category='callback'), instrumentation.time_callback():
+                    instrumentation.transcript_received(result.start, result.duration)
+                    sentence = result.channel.alternatives[0].transcript
+                    if len(sentence) == 0:
+                        return
+                    # with multichannel, channel_index is [channel, number of channels]
+                    speaker = f'speaker {result.channel_index[0]}' if multichannel else 'speaker'
+                    print(f'{speaker}: {sentence}')
+                    extend_transcription(sentence, result.start, result.duration, speaker)
+
+            def extend_transcription(sentence, start, duration, speaker):
+                if multichannel:
+                    self.transcription += f'\n{speaker}: {sentence}'
+                else:
+                    self.transcription += f'{sentence} '
+                self.segments.append((start, start + duration, sentence))
 
             def on_error(self, error, **kwargs):
                 print(f'\n\n{error}\n\n')
@@ -123,7 +180,8 @@ class Recorder():
                 punctuate=True,
                 language='en-US',
                 encoding='linear16',
-                channels=1,
+                channels=self.channels,
+                multichannel=self.channels > 1,
                 sample_rate=16000,
                 # interim_results=True,
                 # utterance_end_ms='1000',
@@ -144,13 +202,15 @@ class Recorder():
             recording (bytes): The recorded audio data.
         '''
 
-        # Convert the bytearray to a numpy array of int16
+        # Convert the bytearray to a numpy array of int16, one column per channel
         int16_array = np.frombuffer(recording, dtype=np.int16)
-        # convert np.int16 array to int array
-        int_array = [int(sample) for sample in int16_array]
-        # Encode each sample using the u_law_e function
-        encoded_recording = np.array([u_law_e(sample) for sample in int_array], dtype=np.uint8)
+        int16_array = int16_array[:len(int16_array) - len(int16_array) % self.channels].reshape(-1, self.channels)
+        if self.channels == 1:
+            int16_array = int16_array[:, 0]
+        # Encode all samples at once
+        encoded_recording = u_law_encode(int16_array)
         # Save the encoded recording to a WAV file
+        ensure_audio_file_path()
         await asyncio.to_thread(write, f'{AUDIO_FILE_PATH}/{AUDIO_FILE_NAME}', 16000, encoded_recording)
 
     async def delete_recording(self) -> None:
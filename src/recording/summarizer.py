@@ -1,5 +1,6 @@
 from openai import AsyncOpenAI
 from config import OPENAI_API_KEY, SUMMARIZE_PROMPT
+from src.utils.tracing import traced
 
 class Summarizer:
     '''
@@ -9,6 +10,7 @@ class Summarizer:
     def __init__(self) -> None:
         self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
+    @traced('summarize', category='llm')
     async def summarize(self, transcription: str) -> str:
         '''
         Summarizes the transcribed speech using OpenAI's GPT-4.
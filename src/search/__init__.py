@@ -0,0 +1,3 @@
+from .transcript_index import TranscriptIndex
+
+__all__ = ['TranscriptIndex']
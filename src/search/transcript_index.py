@@ -0,0 +1,138 @@
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from config import INDEX_FILE_PATH
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS recordings (
+    recording_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text,
+    recording_id UNINDEXED,
+    user_id UNINDEXED,
+    start UNINDEXED,
+    end UNINDEXED,
+    prefix='2 3'
+);
+'''
+
+class TranscriptIndex:
+    '''
+    A local SQLite FTS5 index over the timestamped transcripts of uploaded recordings.
+    Transcripts aren't stored server-side, so only recordings uploaded from this
+    machine are indexed.
+
+    Args:
+        path (str, optional): The path of the index database. Defaults to INDEX_FILE_PATH.
+
+    Methods:
+        add_recording: Indexes the transcript segments of a recording.
+        search: Searches the transcripts of a user's recordings.
+    '''
+
+    def __init__(self, path: str = INDEX_FILE_PATH) -> None:
+        self.path = path
+        self.connection: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+
+    def __connect(self) -> sqlite3.Connection:
+        # opened on first use, so the index isn't created at startup
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.executescript(_SCHEMA)
+        return self.connection
+
+    def add_recording(
+        self,
+        recording_id: str,
+        user_id: str,
+        name: str,
+        segments: Iterable[Tuple[float, float, str]]
+    ) -> None:
+        '''
+        Indexes the transcript segments of a recording, replacing any previous entries for it.
+
+        Args:
+            recording_id (str): The ID of the recording.
+            user_id (str): The ID of the user owning the recording.
+            name (str): The name of the recording.
+            segments (Iterable): Tuples of start and end offset in seconds and transcript text.
+        '''
+        recording_id, user_id = str(recording_id), str(user_id)
+        with self.lock:
+            connection = self.__connect()
+            with connection:
+                # recording_id isn't indexed in the FTS table, so only scan it when re-indexing
+                indexed = connection.execute(
+                    'SELECT 1 FROM recordings WHERE recording_id = ?', (recording_id,)
+                ).fetchone()
+                if indexed:
+                    connection.execute('DELETE FROM segments WHERE recording_id = ?', (recording_id,))
+                connection.execute(
+                    'INSERT OR REPLACE INTO recordings (recording_id, user_id, name) VALUES (?, ?, ?)',
+                    (recording_id, user_id, name)
+                )
+                connection.executemany(
+                    'INSERT INTO segments (text, recording_id, user_id, start, end) VALUES (?, ?, ?, ?, ?)',
+                    ((text, recording_id, user_id, start, end) for start, end, text in segments if text)
+                )
+
+    def search(self, user_id: str, query: str, limit: int = 20) -> List[Tuple[str, str, float, str]]:
+        '''
+        Searches the transcripts of a user's recordings, most recently indexed matches first.
+
+        Args:
+            user_id (str): The ID of the user.
+            query (str): The words to search for, the last one may be a prefix.
+            limit (int, optional): The maximum number of matches to return.
+
+        Returns:
+            list: A list of tuples containing the recording ID, the recording name,
+            the start offset of the matching segment in seconds and the segment text.
+        '''
+        match = self.__match_expression(query)
+        if not match:
+            return []
+        # ordering by rowid lets FTS5 stop after the first matches, while ranking
+        # by relevance would have to score every match first
+        with self.lock:
+            connection = self.__connect()
+            rows = connection.execute(
+                '''
+                SELECT hits.recording_id, recordings.name, hits.start, hits.text
+                FROM (
+                    SELECT rowid AS id, recording_id, start, text FROM segments
+                    WHERE segments MATCH ? AND user_id = ?
+                    ORDER BY rowid DESC LIMIT ?
+                ) AS hits
+                JOIN recordings ON recordings.recording_id = hits.recording_id
+                ORDER BY hits.id DESC
+                ''',
+                (match, str(user_id), limit)
+            ).fetchall()
+        return [(recording_id, name, float(start), text) for recording_id, name, start, text in rows]
+
+    @staticmethod
+    def __match_expression(query: str) -> str:
+        '''
+        Builds an FTS5 query matching all words of the user's query, so FTS5 syntax in it is taken literally.
+        '''
+        words = re.findall(r'\w+', query.lower())
+        if not words:
+            return ''
+        terms = [f'"{word}"' for word in words]
+        # the last word also matches as a prefix, unless it is a single letter that would match too much
+        if len(words[-1]) >= 2:
+            terms[-1] += '*'
+        return ' '.join(terms)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -1,4 +1,5 @@
 from .client import supabase_client
+from .recording_cache import RecordingCache
 from .storage_manager import StorageManager
 
-__all__ = ['supabase_client', 'StorageManager']
+__all__ = ['supabase_client', 'RecordingCache', 'StorageManager']
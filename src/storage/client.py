@@ -1,7 +1,10 @@
-from supabase_py_async import AsyncClient, create_client
+from typing import TYPE_CHECKING
 from config import SUPABASE_URL, SUPABASE_KEY
 
-async def supabase_client(access_token: str = None) -> AsyncClient:
+if TYPE_CHECKING:
+    from supabase_py_async import AsyncClient
+
+async def supabase_client(access_token: str = None) -> 'AsyncClient':
     '''
     Creates a Supabase client with the given access token.
 
@@ -12,6 +15,9 @@ async def supabase_client(access_token: str = None) -> AsyncClient:
         AsyncClient: The Supabase client instance.
 
     '''
+    # imported here to keep the Supabase SDK off the startup path
+    from supabase_py_async import create_client
+
     if access_token:
         return await create_client(SUPABASE_URL, SUPABASE_KEY, access_token=access_token)
 
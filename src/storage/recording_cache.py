@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from config import CACHE_DIR_PATH, CACHE_MAX_BYTES
+
+INDEX_FILE_NAME = 'index.json'
+
+class CacheWriter:
+    '''
+    Writes a recording into the cache while it is being streamed. The recording
+    only becomes visible in the cache once it is committed.
+    '''
+
+    def __init__(self, cache: 'RecordingCache', recording_id: str, version: Optional[str], path: str) -> None:
+        self.cache = cache
+        self.recording_id = recording_id
+        self.version = version
+        self.path = path
+        self.size = 0
+        self.file = open(path, 'wb')
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.size += len(data)
+
+    def commit(self) -> None:
+        '''
+        Adds the written recording to the cache.
+        '''
+        if self.file.closed:
+            return
+        self.file.close()
+        self.cache._add(self)
+
+    def abort(self) -> None:
+        '''
+        Discards the partially written recording.
+        '''
+        if self.file.closed:
+            return
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class RecordingCache:
+    '''
+    A size-bounded, least recently used cache of downloaded recordings on disk,
+    keyed by recording ID and content version. Its index is kept in a JSON file
+    next to the recordings, so the cache survives restarts.
+
+    Args:
+        path (str, optional): The cache directory. Defaults to CACHE_DIR_PATH.
+        max_bytes (int, optional): The maximum total size of the cached recordings. Defaults to CACHE_MAX_BYTES.
+
+    Methods:
+        get: Returns the path of a cached recording.
+        writer: Returns a writer that adds a recording to the cache.
+    '''
+
+    def __init__(self, path: str = CACHE_DIR_PATH, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.entries: Optional[Dict[str, dict]] = None
+        self.lock = threading.Lock()
+
+    def get(self, recording_id: str, version: Optional[str] = None) -> Optional[str]:
+        '''
+        Returns the path of a cached recording and marks it as recently used.
+
+        Args:
+            recording_id (str): The ID of the recording.
+            version (str, optional): The content version of the recording. If given,
+                a cached recording of another version is evicted instead of returned.
+
+        Returns:
+            str: The path of the cached recording, or None if it isn't cached.
+        '''
+        key = str(recording_id)
+        with self.lock:
+            entries = self.__load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.path, entry['file'])
+            if (version is not None and entry['version'] != str(version)) or not os.path.exists(path):
+                self.__remove(key)
+                self.__save()
+                return None
+            entry['last_used'] = time.time()
+            self.__save()
+            return path
+
+    def writer(self, recording_id: str, version: Optional[str] = None) -> CacheWriter:
+        '''
+        Returns a writer for adding a recording to the cache.
+
+        Args:
+            recording_id (str): The ID of the recording.
+            version (str, optional): The content version of the recording.
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        name = self.__file_name(recording_id)
+        return CacheWriter(self, str(recording_id), version, os.path.join(self.path, f'{name}.part'))
+
+    def _add(self, writer: CacheWriter) -> None:
+        name = f'{self.__file_name(writer.recording_id)}.wav'
+        with self.lock:
+            entries = self.__load()
+            self.__remove(writer.recording_id)
+            if writer.size > self.max_bytes:
+                os.remove(writer.path)
+                # the previous version was removed, the index must not point at it anymore
+                self.__save()
+                return
+            os.replace(writer.path, os.path.join(self.path, name))
+            entries[writer.recording_id] = {
+                'file': name,
+                'version': None if writer.version is None else str(writer.version),
+                'size': writer.size,
+                'last_used': time.time(),
+            }
+            self.__evict()
+            self.__save()
+
+    def __evict(self) -> None:
+        '''
+        Removes the least recently used recordings until the cache fits its size limit.
+        '''
+        total = sum(entry['size'] for entry in self.entries.values())
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['size']
+            self.__remove(key)
+
+    def __remove(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        try:
+            os.remove(os.path.join(self.path, entry['file']))
+        except FileNotFoundError:
+            pass
+
+    def __load(self) -> Dict[str, dict]:
+        if self.entries is None:
+            try:
+                with open(os.path.join(self.path, INDEX_FILE_NAME)) as f:
+                    self.entries = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.entries = {}
+        return self.entries
+
+    def __save(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        index_path = os.path.join(self.path, INDEX_FILE_NAME)
+        # write to a temporary file first so a crash can't leave a truncated index
+        with open(f'{index_path}.tmp', 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(f'{index_path}.tmp', index_path)
+
+    @staticmethod
+    def __file_name(recording_id: str) -> str:
+        return re.sub(r'[^\w-]', '_', str(recording_id))
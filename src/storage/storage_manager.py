@@ -1,23 +1,32 @@
 import asyncio
+import sqlite3
 from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 
-import aiofiles
 from config import AUDIO_FILE_PATH, AUDIO_FILE_NAME
+from src.search import TranscriptIndex
+from src.utils.tracing import span, traced
 from .client import supabase_client
+from .recording_cache import RecordingCache
 
 class StorageManager:
     def __init__(self):
         self.executor = ThreadPoolExecutor()
+        self.index = TranscriptIndex()
+        self.cache = RecordingCache()
     '''
     A class that manages the storage operations for recordings.
     '''
 
-    async def upload_recording(self, name: str) -> None:
+    @traced('upload_recording', category='network')
+    async def upload_recording(self, name: str, segments: List[Tuple[float, float, str]] = None) -> None:
         '''
-        Uploads a recording to the storage.
+        Uploads a recording to the storage and adds its transcript to the local search index.
 
         Args:
             name (str): The name of the recording.
+            segments (list, optional): Transcript segments of the recording, as tuples of
+                start and end offset in seconds and text.
 
         Raises:
             Exception: If the user is not authenticated 
@@ -26,24 +35,38 @@ class StorageManager:
 
         from src.auth import session
         if session.is_authenticated():
-            supabase = await supabase_client(session.get_token())
+            supabase = await supabase_client(await session.get_valid_token())
 
             # first, create a database record for the recording
-            response = await supabase.table('recordings').insert({'name': name}).execute()
+            with span('insert_recording_record', category='network'):
+                response = await supabase.table('recordings').insert({'name': name}).execute()
 
             if response:
                 # get the ID of the newly created record
                 recording_id = response.data[0]['id']
                 user_id = session.get_user().id
                 # upload the file to {user_id}/{recording_id}
-                async with aiofiles.open(f'{AUDIO_FILE_PATH}/{AUDIO_FILE_NAME}', 'rb') as f:
-                    file = await f.read()
-
-                await supabase.storage.from_('recordings').upload(
-                    file=file,
-                    path=f'{user_id}/{recording_id}',
-                    file_options={'content-type': 'audio/wav'}
-                )
+                import aiofiles
+                with span('read_recording', category='io'):
+                    async with aiofiles.open(f'{AUDIO_FILE_PATH}/{AUDIO_FILE_NAME}', 'rb') as f:
+                        file = await f.read()
+
+                with span('upload_file', category='network', bytes=len(file)):
+                    await supabase.storage.from_('recordings').upload(
+                        file=file,
+                        path=f'{user_id}/{recording_id}',
+                        file_options={'content-type': 'audio/wav'}
+                    )
+
+                if segments:
+                    # the recording is already uploaded, so a local index failure only affects search
+                    loop = asyncio.get_running_loop()
+                    try:
+                        await loop.run_in_executor(
+                            self.executor, self.index.add_recording, recording_id, user_id, name, segments
+                        )
+                    except sqlite3.Error as e:
+                        print(f'Warning: failed to add the recording to the search index: {e}')
             else:
                 raise Exception('Failed to create a new recording record in the database.')
         else:
@@ -54,7 +77,7 @@ class StorageManager:
         Lists all the recordings for the authenticated user.
 
         Returns:
-            list: A list of tuples containing the recording ID and name.
+            list: A list of tuples containing the recording ID, name and content version.
 
         Raises:
             Exception: If the user is not authenticated 
@@ -62,19 +85,74 @@ class StorageManager:
         '''
         from src.auth import session
         if session.is_authenticated():   
-            supabase = await supabase_client(session.get_token())
+            supabase = await supabase_client(await session.get_valid_token())
 
             # get all recordings for the user
             user_id = session.get_user().id
             response = await supabase.table('recordings').select('*').eq('user_id', user_id).execute()
 
             if response:
-                return [(recording['id'], recording['name']) for recording in response.data]
+                return [
+                    (recording['id'], recording['name'], self.__version(recording))
+                    for recording in response.data
+                ]
             
             raise Exception('Failed to fetch recordings from the database.')
         
         raise Exception('User is not authenticated. Please log in first.')
         
+    async def get_recording_version(self, recording_id: str) -> str:
+        '''
+        Retrieves the content version of a recording, used as part of its cache key.
+
+        Args:
+            recording_id (str): The ID of the recording.
+
+        Returns:
+            str: The content version of the recording.
+
+        Raises:
+            Exception: If the user is not authenticated 
+            or if the recording isn't found in the database.
+        '''
+        from src.auth import session
+        if session.is_authenticated():
+            supabase = await supabase_client(await session.get_valid_token())
+            response = await supabase.table('recordings').select('*').eq('id', recording_id).execute()
+
+            if response and response.data:
+                return self.__version(response.data[0])
+
+            raise Exception('Failed to fetch the recording from the database.')
+
+        raise Exception('User is not authenticated. Please log in first.')
+
+    @staticmethod
+    def __version(recording: dict) -> str:
+        return recording.get('updated_at') or recording.get('created_at')
+
+    async def search_recordings(self, query: str) -> list:
+        '''
+        Searches the transcripts of the authenticated user's recordings.
+
+        Args:
+            query (str): The words to search for.
+
+        Returns:
+            list: A list of tuples containing the recording ID, the recording name,
+            the offset of the match in seconds and the matching transcript segment.
+
+        Raises:
+            Exception: If the user is not authenticated.
+        '''
+        from src.auth import session
+        if session.is_authenticated():
+            user_id = session.get_user().id
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.index.search, user_id, query)
+
+        raise Exception('User is not authenticated. Please log in first.')
+
     async def get_stream_url(self, recording_id: str) -> str:
         '''
         Retrieves the public stream URL for a recording.
@@ -91,7 +169,7 @@ class StorageManager:
         '''
         from src.auth import session
         if session.is_authenticated():
-            supabase = await supabase_client(session.get_token())
+            supabase = await supabase_client(await session.get_valid_token())
             user_id = session.get_user().id
             res = await supabase.storage.from_('recordings').create_signed_url(f'{user_id}/{recording_id}', 600)
             return res['signedURL']
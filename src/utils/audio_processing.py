@@ -1,3 +1,8 @@
+import struct
+from typing import Optional
+
+import numpy as np
+
 BITMASK = 1
 NIBMASK = 0XF
 BYTMASK = 0XFF
@@ -65,6 +70,38 @@ def u_law_e(i16bit: int) -> int:
 
     return encoded^0xff # inverting all bits
 
+# lookup tables built from u_law_e and u_law_d on first use, so the batched
+# versions give exactly the same results as the per-sample functions
+_ENCODE_TABLE: Optional[np.ndarray] = None
+_DECODE_TABLE: Optional[np.ndarray] = None
+
+def u_law_encode(samples: np.ndarray) -> np.ndarray:
+    '''
+    Encodes an array of 16 bit PCM samples, of any shape, to 8 bit u-law encoded data.
+    '''
+    global _ENCODE_TABLE
+    if _ENCODE_TABLE is None:
+        _ENCODE_TABLE = np.array([u_law_e(sample) for sample in range(-32768, 32768)], dtype=np.uint8)
+    # offset the samples so that -32768 maps to the first entry
+    return _ENCODE_TABLE[samples.astype(np.int32) + 32768]
+
+def u_law_decode(encoded: np.ndarray) -> np.ndarray:
+    '''
+    Decodes an array of 8 bit u-law encoded data, of any shape, to 16 bit PCM samples.
+    '''
+    global _DECODE_TABLE
+    if _DECODE_TABLE is None:
+        _DECODE_TABLE = np.array([u_law_d(sample) for sample in range(256)], dtype=np.int16)
+    return _DECODE_TABLE[encoded]
+
+def wav_channels(header: bytes) -> int:
+    '''
+    Returns the number of channels from the header of a PCM WAV file.
+    '''
+    if len(header) < 24 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise ValueError('Not a WAV file')
+    return struct.unpack_from('<H', header, 22)[0]
+
 def _twos_compliment(int_numb: int) -> int:
     if not int_numb: return ~int_numb
 
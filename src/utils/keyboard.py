@@ -0,0 +1,87 @@
+import os
+import select
+import sys
+import threading
+from typing import Callable, Optional
+
+try:
+    import termios
+    import tty
+except ImportError:
+    # not available on Windows, keyboard controls are disabled there
+    termios = None
+
+# key sequences mapped to the commands passed to the callback
+KEYS = {
+    'f': 'forward',
+    '\x1b[C': 'forward',
+    'b': 'back',
+    '\x1b[D': 'back',
+    'q': 'quit',
+}
+
+# seconds to wait for the rest of an escape sequence, a lone Esc has none
+ESCAPE_TIMEOUT = 0.05
+
+# seconds stop() waits for the listener thread
+STOP_TIMEOUT = 1.0
+
+class KeyListener:
+    '''
+    Listens for single key presses on the terminal in a background thread,
+    without waiting for Enter.
+
+    Args:
+        callback (Callable): Called from the listener thread with the command of each
+            recognized key: forward, back or quit.
+    '''
+
+    def __init__(self, callback: Callable[[str], None]) -> None:
+        self.callback = callback
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def available() -> bool:
+        return termios is not None and sys.stdin.isatty()
+
+    def start(self) -> bool:
+        '''
+        Starts listening if the standard input is a terminal.
+
+        Returns:
+            bool: Whether the listener was started.
+        '''
+        if not self.available():
+            return False
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.__listen, name='key-listener', daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(STOP_TIMEOUT)
+            self.thread = None
+
+    def __listen(self) -> None:
+        fd = sys.stdin.fileno()
+        settings = termios.tcgetattr(fd)
+        try:
+            tty.setcbreak(fd)
+            while not self.stopped.is_set():
+                # poll so that stop() doesn't wait for a key press
+                ready, _, _ = select.select([fd], [], [], 0.1)
+                if not ready:
+                    continue
+                # read from the fd, as sys.stdin buffers keys that select doesn't report
+                key = os.read(fd, 1)
+                if key == b'\x1b':
+                    while len(key) < 3 and select.select([fd], [], [], ESCAPE_TIMEOUT)[0]:
+                        key += os.read(fd, 1)
+                command = KEYS.get(key.decode(errors='ignore'))
+                if command:
+                    self.callback(command)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, settings)
@@ -0,0 +1,288 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+# bucket upper bounds in seconds, from a millisecond up to half a minute
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# number of timestamped chunk and transcript events kept for export
+EVENT_BUFFER_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+
+class Histogram:
+    '''
+    A thread-safe histogram with fixed buckets, cheap enough to observe on every audio chunk.
+
+    Args:
+        buckets (tuple): Sorted upper bounds of the buckets.
+    '''
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+
+        cumulative, running = [], 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            running += n
+            cumulative.append((bound, running))
+        return {'count': count, 'sum': total, 'buckets': cumulative}
+
+class MetricsRegistry:
+    '''
+    Collects histograms, counters and recent events of all audio streams,
+    and exports them as JSON or in the Prometheus text format.
+    '''
+
+    def __init__(self) -> None:
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.descriptions: Dict[str, str] = {}
+        self.counters: Dict[Tuple[str, str], float] = {}
+        self.events = deque(maxlen=EVENT_BUFFER_SIZE)
+        self.lock = threading.Lock()
+
+    def histogram(self, name: str, description: str, stream: str) -> Histogram:
+        with self.lock:
+            self.descriptions[name] = description
+            histogram = self.histograms.get((name, stream))
+            if histogram is None:
+                histogram = self.histograms[(name, stream)] = Histogram()
+            return histogram
+
+    def increment(self, name: str, description: str, stream: str, amount: float = 1) -> None:
+        with self.lock:
+            self.descriptions[name] = description
+            self.counters[(name, stream)] = self.counters.get((name, stream), 0) + amount
+
+    def record_event(self, event: dict) -> None:
+        # deque appends are atomic, no lock needed
+        self.events.append(event)
+
+    def to_json(self) -> dict:
+        with self.lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+        return {
+            'histograms': [
+                self.__histogram_json(name, stream, histogram.snapshot())
+                for (name, stream), histogram in histograms
+            ],
+            'counters': [
+                {'name': name, 'stream': stream, 'value': value}
+                for (name, stream), value in counters
+            ],
+            'events': list(self.events)
+        }
+
+    @staticmethod
+    def __histogram_json(name: str, stream: str, snapshot: dict) -> dict:
+        return {
+            'name': name,
+            'stream': stream,
+            'count': snapshot['count'],
+            'sum': snapshot['sum'],
+            'buckets': [
+                {'le': 'inf' if bound == float('inf') else bound, 'count': n}
+                for bound, n in snapshot['buckets']
+            ]
+        }
+
+    def to_prometheus(self) -> str:
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+            descriptions = dict(self.descriptions)
+
+        lines, seen = [], set()
+        for (name, stream), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {name} {descriptions[name]}')
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{{stream="{stream}"}} {value}')
+        for (name, stream), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {name} {descriptions[name]}')
+                lines.append(f'# TYPE {name} histogram')
+            snapshot = histogram.snapshot()
+            for bound, n in snapshot['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stream="{stream}",le="{le}"}} {n}')
+            lines.append(f'{name}_sum{{stream="{stream}"}} {snapshot["sum"]}')
+            lines.append(f'{name}_count{{stream="{stream}"}} {snapshot["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str) -> None:
+        '''
+        Writes the metrics to a file, in the Prometheus text format if the path
+        ends with .prom or .txt and as JSON otherwise. Failing to write the file
+        is logged rather than raised, so metrics never interrupt a recording.
+
+        Args:
+            path (str): The path of the file to write.
+        '''
+        if path.endswith(('.prom', '.txt')):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_json(), indent=2)
+        try:
+            with open(path, 'w') as f:
+                f.write(content)
+        except OSError as e:
+            logger.warning(f'Failed to export metrics to {path}: {e}')
+
+metrics = MetricsRegistry()
+
+class StreamInstrumentation:
+    '''
+    Tracks the latency of a single audio stream, from audio capture through sending
+    it to Deepgram to the arrival of the transcript covering it.
+
+    Args:
+        stream (str): The name of the stream, e.g. recorder or player.
+        sample_rate (int, optional): The sample rate of the sent audio.
+        sample_width (int, optional): The number of bytes per sample of the sent audio.
+        channels (int, optional): The number of interleaved channels of the sent audio.
+        registry (MetricsRegistry, optional): The registry the metrics are recorded in.
+    '''
+
+    def __init__(
+        self,
+        stream: str,
+        sample_rate: int = 16000,
+        sample_width: int = 2,
+        channels: int = 1,
+        registry: MetricsRegistry = metrics
+    ) -> None:
+        self.stream = stream
+        self.bytes_per_second = sample_rate * sample_width * channels
+        self.registry = registry
+        self.sent_bytes = 0
+        # (audio offset at the end of the chunk, capture time) of chunks not transcribed yet
+        self.pending = deque()
+        self.lock = threading.Lock()
+
+        self.latency = registry.histogram(
+            'transcription_utterance_latency_seconds',
+            'Time from capturing the end of an utterance to receiving its transcript.',
+            stream
+        )
+        self.send_delay = registry.histogram(
+            'transcription_send_delay_seconds',
+            'Time from capturing an audio chunk to sending it to Deepgram.',
+            stream
+        )
+        self.backlog = registry.histogram(
+            'transcription_backlog_seconds',
+            'Seconds of audio sent to Deepgram but not yet covered by a transcript.',
+            stream
+        )
+        self.callback_duration = registry.histogram(
+            'transcription_callback_duration_seconds',
+            'Time spent in the transcript callback.',
+            stream
+        )
+
+    @staticmethod
+    def now() -> float:
+        return time.time()
+
+    def chunk_sent(self, nbytes: int, captured_at: float) -> None:
+        '''
+        Records an audio chunk that was sent to Deepgram.
+
+        Args:
+            nbytes (int): The size of the sent chunk in bytes.
+            captured_at (float): The time the chunk was captured, from now().
+        '''
+        sent_at = time.time()
+        with self.lock:
+            self.sent_bytes += nbytes
+            offset = self.sent_bytes / self.bytes_per_second
+            self.pending.append((offset, captured_at))
+
+        self.send_delay.observe(sent_at - captured_at)
+        self.registry.increment('transcription_sent_bytes_total', 'Bytes of audio sent to Deepgram.', self.stream, nbytes)
+        self.registry.record_event({
+            'type': 'chunk',
+            'stream': self.stream,
+            'captured_at': captured_at,
+            'sent_at': sent_at,
+            'audio_offset': offset,
+            'bytes': nbytes
+        })
+
+    def transcript_received(self, start: float, duration: float) -> Optional[float]:
+        '''
+        Records the arrival of a transcript.
+
+        Args:
+            start (float): The audio offset in seconds the transcript starts at.
+            duration (float): The duration in seconds of the audio the transcript covers.
+
+        Returns:
+            float: The latency from capturing the end of the utterance, if known.
+        '''
+        arrived_at = time.time()
+        end = start + duration
+        captured_at = None
+        with self.lock:
+            # chunks that end before the transcript are fully transcribed
+            while len(self.pending) > 1 and self.pending[0][0] < end:
+                self.pending.popleft()
+            if self.pending and self.pending[0][0] >= end:
+                captured_at = self.pending[0][1]
+            backlog = self.sent_bytes / self.bytes_per_second - end
+
+        latency = arrived_at - captured_at if captured_at is not None else None
+        if latency is not None:
+            self.latency.observe(latency)
+        self.backlog.observe(max(0.0, backlog))
+        self.registry.increment('transcription_transcripts_total', 'Transcripts received from Deepgram.', self.stream)
+        self.registry.record_event({
+            'type': 'transcript',
+            'stream': self.stream,
+            'arrived_at': arrived_at,
+            'audio_start': start,
+            'audio_end': end,
+            'latency': latency
+        })
+        return latency
+
+    @contextmanager
+    def time_callback(self) -> Iterator[None]:
+        '''
+        Measures the duration of a transcript callback.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.callback_duration.observe(time.perf_counter() - start)
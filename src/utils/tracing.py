@@ -0,0 +1,173 @@
+import asyncio
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import TRACE_EXPORT_PATH
+
+class _NullSpan:
+    '''
+    Span used while tracing is disabled, entering and exiting it does nothing.
+    '''
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    '''
+    A span that records a complete trace event when it exits.
+    '''
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = repr(exc)
+        self.tracer.add_span(self.name, self.start, end, self.category, self.args)
+
+class Tracer:
+    '''
+    Records spans as Chrome trace events, which can be opened in Perfetto or chrome://tracing.
+
+    Spans of each asyncio task and of each thread (e.g. Deepgram callback threads)
+    are recorded on their own track, so concurrent work shows up side by side.
+
+    Args:
+        path (str, optional): File the trace is written to at exit. Tracing is disabled if not set.
+    '''
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.enabled = bool(path)
+        self.events = []
+        self.tracks: Dict[Tuple[str, int], int] = {}
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        if self.enabled:
+            atexit.register(self.export)
+
+    def span(self, name: str, category: str = 'app', **args: Any) -> Any:
+        '''
+        Returns a context manager that records a span around its body.
+
+        Args:
+            name (str): The name of the span.
+            category (str, optional): The category of the span, e.g. encode, network or llm.
+            **args: Additional arguments shown with the span.
+        '''
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args)
+
+    def traced(self, name: Optional[str] = None, category: str = 'app') -> Callable:
+        '''
+        Decorator that records a span around each call of a function or coroutine function.
+
+        Args:
+            name (str, optional): The name of the span. Defaults to the qualified name of the function.
+            category (str, optional): The category of the span.
+        '''
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__qualname__
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, category):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, category):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def add_span(self, name: str, start: float, end: float, category: str = 'app', args: dict = None) -> None:
+        '''
+        Records a span from perf_counter() timestamps.
+        '''
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self.origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self.pid,
+            'tid': self.__track(),
+        }
+        if args:
+            event['args'] = args
+        with self.lock:
+            self.events.append(event)
+
+    def __track(self) -> int:
+        '''
+        Returns the trace track of the current asyncio task, or of the current thread outside of a task.
+        '''
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+
+        if task is not None:
+            key, label = ('task', id(task)), f'task {task.get_name()}'
+        else:
+            thread = threading.current_thread()
+            key, label = ('thread', thread.ident), f'thread {thread.name}'
+
+        with self.lock:
+            tid = self.tracks.get(key)
+            if tid is None:
+                tid = self.tracks[key] = len(self.tracks) + 1
+                self.events.append({
+                    'name': 'thread_name',
+                    'ph': 'M',
+                    'pid': self.pid,
+                    'tid': tid,
+                    'args': {'name': label}
+                })
+        return tid
+
+    def export(self, path: Optional[str] = None) -> None:
+        '''
+        Writes the recorded events as Chrome trace-event JSON.
+
+        Args:
+            path (str, optional): The file to write. Defaults to the tracer's path.
+        '''
+        path = path or self.path
+        if not path:
+            return
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+tracer = Tracer(TRACE_EXPORT_PATH)
+span = tracer.span
+traced = tracer.traced